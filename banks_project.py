@@ -1,63 +1,245 @@
 # Import necessary libraries
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import lxml.etree
+import lxml.html
+import numpy as np
 import pandas as pd
 import sqlite3
-from datetime import datetime
+import csv
 import os
+import argparse
+import atexit
+import gzip
+import hashlib
+import math
+import tempfile
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 
 # --- Global Variables ---
 URL = 'https://en.wikipedia.org/wiki/List_of_largest_banks'
 
-# use a subfolder for all generated files
+# use a subfolder for all generated files (can be changed with --output-dir)
 OUTPUT_DIR = './output'
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-OUTPUT_CSV_PATH = os.path.join(OUTPUT_DIR, 'largest_banks_data.csv')
-DB_NAME = os.path.join(OUTPUT_DIR, 'banks.db')
+OUTPUT_CSV_FILE = 'largest_banks_data.csv'
+DB_FILE = 'banks.db'
 TABLE_NAME = 'Largest_banks'
-LOG_FILE = os.path.join(OUTPUT_DIR, 'code_log.txt')
+LOG_FILE_NAME = 'code_log.txt'
+
+# downloaded page is cached (gzipped) and reused for a day; the ETag allows cheap revalidation.
+# {key} is a hash of the URL, so every URL gets its own cache and ETag
+PAGE_CACHE_FILE = 'page-{key}.html.gz'
+PAGE_ETAG_FILE = 'page-{key}.html.etag'
+PAGE_CACHE_TTL = 24 * 60 * 60  # seconds
+
+# default currency basket, can be replaced with --currency CODE=RATE;
+# read-only because transform() precomputes its rate vector once
+EXCHANGE_RATES = MappingProxyType({
+    'GBP': 0.8,     # 1 USD ≈ 0.80 GBP
+    'EUR': 0.93,    # 1 USD ≈ 0.93 EUR
+    'PHP': 58     # 1 USD ≈ 58 PHP (approx early 2025 rate)
+})
 
 TABLE_ATTRIBUTES = ['Name', 'MC_USD_Billion']
 FINAL_TABLE_ATTRIBUTES = ['Name', 'MC_USD_Billion', 'MC_GBP_Billion', 'MC_EUR_Billion', 'MC_PHP_Billion']
 
+# one shared HTTP session so the TCP/TLS connection is kept alive and reused
+SESSION = requests.Session()
+SESSION.headers.update({'User-Agent': 'Mozilla/5.0'})
+SESSION.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2,
+                                      max_retries=Retry(total=3, backoff_factor=0.3)))
+
 
 
 # --- Task 1: Logging Function ---
-def log_progress(message):
-    """Appends a timestamped log message to the log file."""
-    timestamp_format = '%Y-%m-%d-%H:%M:%S'  # corrected format
-    now = datetime.now()
-    timestamp = now.strftime(timestamp_format)
-    with open(LOG_FILE, "a") as f:
-        f.write(timestamp + ' : ' + message + '\n')
+_TS_FMT = '%Y-%m-%d-%H:%M:%S'
+
+# the wall-clock time is formatted once per run; each line adds the seconds elapsed since then
+_RUN_STAMP = time.strftime(_TS_FMT)
+_RUN_START = time.monotonic()
+
+# the log file is opened once, on the first message, and closed when the interpreter exits
+_LOG_PATH = os.path.join(OUTPUT_DIR, LOG_FILE_NAME)
+_LOG_FH = None
+_LOG_LOCK = threading.Lock()  # the CSV and DB loads log from worker threads
+
+def close_log():
+    """Flushes and closes the log file if it is open."""
+    global _LOG_FH
+    with _LOG_LOCK:
+        if _LOG_FH is not None:
+            _LOG_FH.close()
+            _LOG_FH = None
+
+atexit.register(close_log)
+
+def set_log_file(path):
+    """Sends the following log messages to another file and restarts the run clock."""
+    global _LOG_PATH, _RUN_STAMP, _RUN_START
+    close_log()
+    _LOG_PATH = path
+    _RUN_STAMP, _RUN_START = time.strftime(_TS_FMT), time.monotonic()
+
+def log_progress(message, _clock=time.monotonic):
+    """Appends a timestamped log message (run start + elapsed seconds) to the log file."""
+    global _LOG_FH
+    with _LOG_LOCK:
+        if _LOG_FH is None:
+            # the folder is created here rather than at import, so library use works from any cwd
+            os.makedirs(os.path.dirname(_LOG_PATH) or '.', exist_ok=True)
+            _LOG_FH = open(_LOG_PATH, "a", buffering=8192)
+        _LOG_FH.write(f"{_RUN_STAMP} +{_clock() - _RUN_START:.3f}s : {message}\n")
 
 
 
 # --- Task 2: Extraction Function ---
-from io import StringIO  # Required for the new pandas version
-
-def extract(url, table_attribs):
+def read_cached_page(cache_path):
+    """Returns the cached page bytes."""
+    with open(cache_path, 'rb') as f:
+        return gzip.decompress(f.read())
+
+
+def write_atomically(path, data):
+    """Writes bytes to a temp file next to path and renames it into place, so readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def remove_if_exists(path):
+    """Deletes a file, ignoring it if it is already gone."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def locate_table(chunks):
+    """
+    Feeds HTML byte chunks to an incremental parser and stops as soon as the
+    table after the "By market capitalization" heading is complete.
+    Returns the table element and the bytes consumed up to that point.
+    """
+    parser = lxml.etree.HTMLPullParser(events=('start', 'end'))
+    parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+    received = []
+
+    def events():
+        for chunk in chunks:
+            received.append(chunk)
+            parser.feed(chunk)
+            yield from parser.read_events()
+        parser.close()
+        yield from parser.read_events()
+
+    heading_seen, table = False, None
+    for event, element in events():
+        if event == 'start':
+            if element.tag == 'h2' and element.get('id') == 'By_market_capitalization':
+                heading_seen = True
+            elif heading_seen and table is None and element.tag == 'table':
+                table = element
+        elif table is not None and element is table:
+            return table, b''.join(received)
+    raise ValueError('Market capitalization table not found in the page')
+
+
+def fetch_table(url, cache_dir=OUTPUT_DIR):
+    """Returns the market capitalization table element, using the local cache while it is fresh."""
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, PAGE_CACHE_FILE.format(key=key))
+    etag_path = os.path.join(cache_dir, PAGE_ETAG_FILE.format(key=key))
+
+    def load_cached_table():
+        """Returns the table from the cached page, or None (dropping the cache) if it is unreadable."""
+        try:
+            return locate_table([read_cached_page(cache_path)])[0]
+        except (OSError, EOFError, gzip.BadGzipFile):
+            # e.g. a copy truncated by an interrupted run; its ETag must go too,
+            # otherwise the server keeps answering 304 for the broken file
+            remove_if_exists(cache_path)
+            remove_if_exists(etag_path)
+            return None
+
+    cached = os.path.exists(cache_path)
+    if cached and time.time() - os.path.getmtime(cache_path) < PAGE_CACHE_TTL:
+        table = load_cached_table()
+        if table is not None:
+            return table
+        cached = False
+
+    headers = {}
+    if cached and os.path.exists(etag_path):
+        with open(etag_path) as f:
+            headers['If-None-Match'] = f.read().strip()
+
+    # stream the body so parsing overlaps the download; closing the response early
+    # skips the rest of the article once the table has been received
+    with SESSION.get(url, headers=headers, timeout=15, stream=True) as response:
+        not_modified = response.status_code == 304
+        if not not_modified:
+            response.raise_for_status()
+
+            # raw bytes let the parser read the page's own charset instead of requests guessing it
+            table, page = locate_table(response.iter_content(chunk_size=16384))
+            etag = response.headers.get('ETag')
+
+    if not_modified:
+        # unchanged on the server: keep the cached copy and restart its TTL
+        table = load_cached_table()
+        if table is not None:
+            os.utime(cache_path)
+            return table
+        # the cached copy was unreadable and has been dropped, so this is a plain GET
+        return fetch_table(url, cache_dir)
+
+    # only the page up to the end of the table is cached, which is all extract() needs.
+    # The old ETag goes first and the new one is written last, so an interrupted
+    # update never leaves an ETag paired with a page it does not describe
+    os.makedirs(cache_dir, exist_ok=True)
+    remove_if_exists(etag_path)
+    write_atomically(cache_path, gzip.compress(page))
+    if etag:
+        write_atomically(etag_path, etag.encode('utf-8'))
+    return table
+
+
+# XPath queries compiled once: data rows (header rows only hold <th> cells) and their cells
+_DATA_ROWS = lxml.etree.XPath('.//tr[td]')
+_ROW_CELLS = lxml.etree.XPath('./td')
+
+
+def extract(url, table_attribs, cache_dir=OUTPUT_DIR):
     """Extracts and cleans the required table data from the URL."""
     log_progress('Preliminaries complete. Initiating ETL process')
     
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    page = requests.get(url, headers=headers).text
-    data = BeautifulSoup(page, 'html.parser')
-    
-    heading = data.find('h2', id='By_market_capitalization')
-    table = heading.find_next('table')
-
-    df = pd.read_html(StringIO(str(table)))[0]
-    
-    df = df.head(10)
-    # Correctly select the 1st (Bank Name) and 3rd (Market Cap) columns
-    df = df.iloc[:, [0, 2]] 
-    df.columns = table_attribs
-    
-    df['MC_USD_Billion'] = df['MC_USD_Billion'].astype(str)
-    df['MC_USD_Billion'] = df['MC_USD_Billion'].str.replace(r'\[.*\]', '', regex=True)
-    df['MC_USD_Billion'] = pd.to_numeric(df['MC_USD_Billion'], errors='coerce')
+    table = fetch_table(url, cache_dir)
+
+    # walk the first 10 data rows directly
+    names, market_caps = [], []
+    for row in _DATA_ROWS(table)[:10]:
+        cells = _ROW_CELLS(row)
+        # the 1st (Bank Name) and 3rd (Market Cap) columns
+        names.append(cells[0].text_content().strip())
+        # drop any trailing citation marker such as "[4]" with a plain split, no regex needed,
+        # and the thousands separators pd.read_html used to handle ("1,234.5" -> "1234.5")
+        market_caps.append(cells[2].text_content().split('[', 1)[0].replace(',', '').strip())
+
+    df = pd.DataFrame({
+        table_attribs[0]: names,
+        table_attribs[1]: pd.to_numeric(market_caps, errors='coerce'),
+    })
     
     log_progress('Data extraction from HTML Webpage complete. Initiating Transformation process')
     return df
@@ -66,20 +248,32 @@ def extract(url, table_attribs):
 
 
 # --- Task 3: Transformation Function ---
-def transform(df):
+def currency_columns(exchange_rates):
+    """Returns the output column names and the rate vector for an exchange-rate mapping."""
+    columns = [f'MC_{currency}_Billion' for currency in exchange_rates]
+    return columns, np.array(list(exchange_rates.values()), dtype=np.float64)
+
+# the default basket is materialized once instead of on every transform() call
+_DEFAULT_COLUMNS, _DEFAULT_RATES = currency_columns(EXCHANGE_RATES)
+
+
+def transform(df, exchange_rates=EXCHANGE_RATES):
     """
-    Transforms the dataframe by adding market capitalization in GBP, EUR, and PHP.
-    The exchange rates are now hardcoded to remove dependency on external CSV.
+    Transforms the dataframe by adding market capitalization in each currency
+    of exchange_rates (GBP, EUR, and PHP by default).
+    The exchange rates are hardcoded to remove dependency on external CSV.
     """
-    exchange_rate_dict = {
-        'GBP': 0.8,     # 1 USD ≈ 0.80 GBP
-        'EUR': 0.93,    # 1 USD ≈ 0.93 EUR
-        'PHP': 58     # 1 USD ≈ 58 PHP (approx early 2025 rate)
-    }
-
-    df['MC_GBP_Billion'] = round(df['MC_USD_Billion'] * exchange_rate_dict['GBP'], 2)
-    df['MC_EUR_Billion'] = round(df['MC_USD_Billion'] * exchange_rate_dict['EUR'], 2)
-    df['MC_PHP_Billion'] = round(df['MC_USD_Billion'] * exchange_rate_dict['PHP'], 2)
+    if exchange_rates is EXCHANGE_RATES:
+        columns, rates = _DEFAULT_COLUMNS, _DEFAULT_RATES
+    else:
+        columns, rates = currency_columns(exchange_rates)
+
+    # convert into every currency at once: (banks x 1) * (1 x currencies) -> banks x currencies
+    usd = df['MC_USD_Billion'].to_numpy()
+    df[columns] = np.round(np.multiply.outer(usd, rates), 2)
+
+    # bank names are stored as int codes plus one lookup of unique strings
+    df['Name'] = df['Name'].astype('category')
     
     log_progress('Data transformation complete. Initiating loading process')
     return df
@@ -90,15 +284,48 @@ def transform(df):
 # --- Task 4: Loading to CSV Function ---
 def load_to_csv(df, output_path):
     """Saves the dataframe to a CSV file."""
-    df.to_csv(output_path, index=False)
+    # a plain csv.writer is plenty for 10 rows and skips pandas' formatting machinery
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(df.columns)
+        # missing values become empty fields, as df.to_csv wrote them (csv.writer would write "nan")
+        writer.writerows(tuple('' if pd.isna(value) else value for value in row)
+                         for row in df.itertuples(index=False, name=None))
     log_progress('Data saved to CSV file')
 
 
 
 # --- Task 5: Loading to Database Function ---
+def connect_db(db_name):
+    """Opens the SQLite database with a page cache and temp storage kept in memory."""
+    # check_same_thread=False: the load runs on a worker thread, the queries on the main one
+    conn = sqlite3.connect(db_name, check_same_thread=False)
+    conn.execute('PRAGMA cache_size=-20000')  # negative = KiB, so ~20 MB
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
 def load_to_db(df, conn, table_name):
     """Loads the dataframe into an SQLite database table."""
-    df.to_sql(table_name, conn, if_exists='replace', index=False)
+    # bulk-load settings: the table is rebuilt from scratch on every run anyway
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA journal_mode=MEMORY')
+
+    columns = ', '.join(f'{col} {"TEXT" if col == "Name" else "REAL"}' for col in df.columns)
+    placeholders = ', '.join('?' * len(df.columns))
+
+    # drop, recreate and fill the table inside a single transaction (one journal sync)
+    conn.execute('BEGIN')
+    try:
+        conn.execute(f'DROP TABLE IF EXISTS {table_name}')
+        conn.execute(f'CREATE TABLE {table_name} ({columns})')
+        conn.executemany(f'INSERT INTO {table_name} VALUES ({placeholders})',
+                         df.itertuples(index=False, name=None))
+    except Exception:
+        # leave the connection usable (and the previous table intact) if the load fails
+        conn.rollback()
+        raise
+    conn.commit()
     log_progress('Data loaded to Database as table. Running the query')
 
 
@@ -107,45 +334,101 @@ def load_to_db(df, conn, table_name):
 def run_queries(query_statement, conn):
     """Runs a query on the database and prints the output."""
     print(f"Executing query: {query_statement}")
-    query_output = pd.read_sql(query_statement, conn)
-    print(query_output)
+    # plain cursor instead of pd.read_sql: no DataFrame is needed just to print a few rows
+    cursor = conn.execute(query_statement)
+    rows = cursor.fetchall()
+    print([column[0] for column in cursor.description])
+    print(*rows, sep='\n')
     print("-" * 30)
     log_progress(f'Query executed: {query_statement}')
 
 
 
 # --- Main Execution Block ---
-if __name__ == '__main__':
+def run_etl(url=URL, currencies=None, output_dir=OUTPUT_DIR):
+    """
+    Runs the full ETL job, writing every generated file into output_dir.
+    currencies maps currency codes to USD exchange rates (EXCHANGE_RATES by default).
+    """
+    if currencies is None:
+        currencies = EXCHANGE_RATES
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_csv_path = os.path.join(output_dir, OUTPUT_CSV_FILE)
+    db_name = os.path.join(output_dir, DB_FILE)
+    log_file = os.path.join(output_dir, LOG_FILE_NAME)
+    set_log_file(log_file)
+
     log_progress('ETL Job Started')
 
-    extracted_data = extract(URL, TABLE_ATTRIBUTES)
+    extracted_data = extract(url, TABLE_ATTRIBUTES, output_dir)
     print("--- Extracted Data (Top 10 Banks) ---")
     print(extracted_data)
     print("-" * 30)
 
-    transformed_data = transform(extracted_data)
+    transformed_data = transform(extracted_data, currencies)
     print("\n--- Transformed Data (with additional currencies) ---")
     print(transformed_data)
     print("-" * 30)
     
-    load_to_csv(transformed_data, OUTPUT_CSV_PATH)
-    
-    conn = sqlite3.connect(DB_NAME)
-    log_progress('SQL Connection initiated')
-    
-    load_to_db(transformed_data, conn, TABLE_NAME)
-    
-    print("\n--- Running Queries on the Database ---")
-    run_queries(f'SELECT * FROM {TABLE_NAME}', conn)
-    run_queries(f'SELECT AVG(MC_GBP_Billion) FROM {TABLE_NAME}', conn)
-    run_queries(f'SELECT Name FROM {TABLE_NAME} LIMIT 5', conn)
-    
-    conn.close()
-    log_progress('SQL Connection closed')
+    conn = None
+    try:
+        # the CSV write and the database load are independent, so let their I/O overlap;
+        # leaving the with-block waits for both jobs, so conn is never closed under a worker
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            csv_job = executor.submit(load_to_csv, transformed_data, output_csv_path)
+
+            conn = connect_db(db_name)
+            log_progress('SQL Connection initiated')
+
+            db_job = executor.submit(load_to_db, transformed_data, conn, TABLE_NAME)
+            csv_job.result()
+            db_job.result()
+
+        first_currency = next(iter(currencies))
+        print("\n--- Running Queries on the Database ---")
+        run_queries(f'SELECT * FROM {TABLE_NAME}', conn)
+        run_queries(f'SELECT AVG(MC_{first_currency}_Billion) FROM {TABLE_NAME}', conn)
+        run_queries(f'SELECT Name FROM {TABLE_NAME} LIMIT 5', conn)
+    finally:
+        if conn is not None:
+            conn.close()
+            log_progress('SQL Connection closed')
     
     log_progress('ETL Job Ended')
 
-    print(f"\nProcess complete. Check the generated files inside '{OUTPUT_DIR}':")
-    print(f" - {OUTPUT_CSV_PATH}")
-    print(f" - {DB_NAME}")
-    print(f" - {LOG_FILE}")
\ No newline at end of file
+    print(f"\nProcess complete. Check the generated files inside '{output_dir}':")
+    print(f" - {output_csv_path}")
+    print(f" - {db_name}")
+    print(f" - {log_file}")
+    return transformed_data
+
+
+def parse_currency(value):
+    """Parses a CODE=RATE command-line argument; CODE must be a 3-letter ISO 4217 code."""
+    code, sep, rate = value.partition('=')
+    code = code.strip().upper()
+    # the code ends up unquoted in column names and SQL, so only plain letters are accepted
+    if not sep or len(code) != 3 or not (code.isascii() and code.isalpha()):
+        raise argparse.ArgumentTypeError(f"expected CODE=RATE with a 3-letter currency code, got '{value}'")
+    # MC_USD_Billion is the source column; converting "into" it would overwrite the base values
+    if f'MC_{code}_Billion' in TABLE_ATTRIBUTES:
+        raise argparse.ArgumentTypeError(f"{code} is the source currency and cannot be a conversion target")
+    try:
+        rate = float(rate)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected CODE=RATE, got '{value}'") from None
+    if not (math.isfinite(rate) and rate > 0):
+        raise argparse.ArgumentTypeError(f"exchange rate must be a finite positive number, got '{value}'")
+    return code, rate
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="ETL job for the world's largest banks by market capitalization.")
+    parser.add_argument('--url', default=URL, help='page holding the "By market capitalization" table')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='folder for the CSV, database, log and page cache')
+    parser.add_argument('--currency', dest='currencies', action='append', type=parse_currency, metavar='CODE=RATE',
+                        help='currency to convert USD into (repeatable); defaults to GBP, EUR and PHP')
+    args = parser.parse_args()
+
+    run_etl(args.url, dict(args.currencies) if args.currencies else None, args.output_dir)
\ No newline at end of file
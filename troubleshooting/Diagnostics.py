@@ -1,6 +1,8 @@
 # --- THIS IS A SPECIAL DIAGNOSTIC SCRIPT ---
 import requests
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import time
 import os
 
 # --- Global Variables ---
@@ -13,13 +15,22 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 LOG_FILE = os.path.join(OUTPUT_DIR, 'code_log.txt')
 OUTPUT_HTML_FILE = os.path.join(OUTPUT_DIR, 'page_source.html')
 
+# one shared HTTP session so reruns reuse the kept-alive connection
+SESSION = requests.Session()
+SESSION.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                  'AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/91.0.4472.124 Safari/537.36'
+})
+SESSION.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2,
+                                      max_retries=Retry(total=3, backoff_factor=0.3)))
+
+_TS_FMT = '%Y-%m-%d-%H:%M:%S'
+
 def log_progress(message):
     """Appends a timestamped log message to the shared log file."""
-    timestamp_format = '%Y-%m-%d-%H:%M:%S'
-    now = datetime.now()
-    timestamp = now.strftime(timestamp_format)
     with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(timestamp + ' : ' + message + '\n')
+        f.write(f"{time.strftime(_TS_FMT)} : {message}\n")
 
 def run_diagnostic(url):
     """
@@ -28,19 +39,14 @@ def run_diagnostic(url):
     log_progress('Starting diagnostic run.')
     print(f"Attempting to download page from: {url}")
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                      'AppleWebKit/537.36 (KHTML, like Gecko) '
-                      'Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = SESSION.get(url, timeout=15)
         response.raise_for_status()
-        page_text = response.text
+        page_bytes = response.content
         
-        with open(OUTPUT_HTML_FILE, 'w', encoding='utf-8') as f:
-            f.write(page_text)
+        # save the bytes exactly as received, no charset detection needed
+        with open(OUTPUT_HTML_FILE, 'wb') as f:
+            f.write(page_bytes)
             
         print("-" * 50)
         print(f"SUCCESS: The webpage content has been saved to the file: '{OUTPUT_HTML_FILE}'")